@@ -21,6 +21,7 @@ from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import PolynomialFeatures
 
 from .core import SECRET_ID
+from .export import export_metrics
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -241,6 +242,19 @@ def get_secrets(secret_id: str) -> dict | None:
         return None
 
 
+def save_metrics(metrics: pd.DataFrame) -> None:
+    path = os.getenv("METRICS_PATH")
+    if path is None:
+        logger.info("METRICS_PATH not set, skipping metrics export")
+        return
+    logger.info(f"Exporting metrics to {path}")
+    try:
+        n_rows = export_metrics(metrics, Path(path))
+        logger.info(f"Appended {n_rows} rows of metrics")
+    except Exception as e:
+        logger.info(f"Failed to export metrics: {e}")
+
+
 def setup_envs() -> None:
     secrets = get_secrets(secret_id=SECRET_ID)
     if secrets:
@@ -260,6 +274,7 @@ def main() -> None:
     figures = create_figures(metrics)
     message = create_message(figures, table)
     send_email(message)
+    save_metrics(metrics)
 
 
 def handler(event, context):
@@ -0,0 +1,125 @@
+"""Columnar export of computed metrics that can be memory mapped by other jobs.
+
+A metrics store is a directory holding a versioned `header.json` and one raw
+little-endian array file per column. The header row count is updated last, so
+readers never see a partially appended day.
+
+Date, close and moving average columns only depend on past prices and are appended.
+The poly columns are refit and the risk columns normalised over the full history on
+each run, so these columns, listed under `rewritten` in the header, are replaced
+whole on every export and always match a fresh `create_metrics` run.
+"""
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+METRICS_FORMAT = "markets-metrics"
+METRICS_VERSION = 1
+HEADER_NAME = "header.json"
+re_columns = r"^(sma_|risk_|poly$|poly_\d{4}$)"
+re_rewritten = r"^(risk_|poly)"
+
+
+def metrics_to_columns(metrics: pd.DataFrame) -> dict[str, np.ndarray]:
+    """Select the date, close, sma, poly and risk columns as numpy arrays."""
+    columns = {
+        "date": pd.to_datetime(metrics["date"]).to_numpy("datetime64[ns]"),
+        "close": metrics["close"].to_numpy("<f8"),
+    }
+    for c in metrics.filter(regex=re_columns).columns:
+        columns[c] = metrics[c].to_numpy("<f8")
+    return columns
+
+
+def read_header(path: Path) -> dict:
+    with (path / HEADER_NAME).open() as f:
+        header = json.load(f)
+    if header.get("format") != METRICS_FORMAT:
+        raise ValueError(f"{path} is not a metrics store.")
+    if header.get("version") != METRICS_VERSION:
+        raise ValueError(f"Unsupported metrics store version: {header.get('version')}")
+    return header
+
+
+def write_header(path: Path, header: dict) -> None:
+    path_tmp = path / f"{HEADER_NAME}.tmp"
+    with path_tmp.open("w") as f:
+        json.dump(header, f, indent=2)
+    path_tmp.replace(path / HEADER_NAME)
+
+
+def read_metrics(path: Path) -> dict[str, np.ndarray]:
+    """Memory map each column file and return zero-copy read only column views."""
+    header = read_header(path)
+    n_rows = header["n_rows"]
+    result = {}
+    for name, dtype in header["columns"]:
+        if n_rows == 0:
+            column = np.empty(0, dtype=dtype)
+            column.flags.writeable = False
+        else:
+            column = np.memmap(
+                path / f"{name}.bin", dtype=dtype, mode="r", shape=n_rows
+            )
+        result[name] = column
+    return result
+
+
+def read_dates(path: Path, n_rows: int) -> np.ndarray:
+    if n_rows == 0:
+        return np.empty(0, dtype="<M8[ns]")
+    return np.fromfile(path / "date.bin", dtype="<M8[ns]", count=n_rows)
+
+
+def write_column(path: Path, column: np.ndarray) -> None:
+    path_tmp = path.with_name(f"{path.name}.tmp")
+    column.tofile(path_tmp)
+    path_tmp.replace(path)
+
+
+def export_metrics(metrics: pd.DataFrame, path: Path) -> int:
+    """Append rows newer than the stored history and rewrite the refit columns.
+
+    The metrics must cover the stored history from its first date, returns rows
+    appended.
+    """
+    columns = metrics_to_columns(metrics)
+    schema = [[name, column.dtype.str] for name, column in columns.items()]
+    rewritten = [name for name in columns if re.search(re_rewritten, name)]
+    if (path / HEADER_NAME).exists():
+        header = read_header(path)
+    else:
+        path.mkdir(parents=True, exist_ok=True)
+        header = {
+            "format": METRICS_FORMAT,
+            "version": METRICS_VERSION,
+            "n_rows": 0,
+            "columns": schema,
+            "rewritten": rewritten,
+        }
+    if header["columns"] != schema:
+        raise ValueError(
+            f"Metrics columns {[c for c, _ in schema]} do not match {path} columns "
+            f"{[c for c, _ in header['columns']]}."
+        )
+
+    n_rows = header["n_rows"]
+    if not np.array_equal(columns["date"][:n_rows], read_dates(path, n_rows)):
+        raise ValueError(f"Metrics dates do not cover the history stored in {path}.")
+    n_new = columns["date"].shape[0] - n_rows
+    for name, column in columns.items():
+        if name in rewritten:
+            write_column(path / f"{name}.bin", column)
+            continue
+        with (path / f"{name}.bin").open("ab") as f:
+            # drop bytes from an append that failed before the header was updated
+            f.truncate(n_rows * column.dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(column[n_rows:].tobytes())
+    header["n_rows"] = n_rows + n_new
+    write_header(path, header)
+    return n_new
@@ -3,11 +3,13 @@
 import os
 from unittest.mock import MagicMock, patch
 
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
 import pytest
 from conftest import EXAMPLE_EMAIL, EXAMPLE_PASSWORD
 
-from src.markets import app
+from src.markets import app, export
 
 
 def test_main(mock_email_server, mock_secrests_manager_client, mock_df):
@@ -88,3 +90,94 @@ def test_update_margin():
     assert margins.r == 5
     assert margins.t == 5
     assert margins.b == 5
+
+
+def test_save_metrics_unset(mock_df, monkeypatch):
+    monkeypatch.delenv("METRICS_PATH", raising=False)
+    with patch("src.markets.app.export_metrics") as mock_export_metrics:
+        app.save_metrics(app.create_metrics(mock_df))
+    mock_export_metrics.assert_not_called()
+
+
+def test_save_metrics_invalid(mock_df, tmp_path, monkeypatch):
+    path = tmp_path / "metrics"
+    path.mkdir()
+    (path / "header.json").write_text("{")
+    monkeypatch.setenv("METRICS_PATH", str(path))
+    try:
+        app.save_metrics(app.create_metrics(mock_df))
+    except Exception as e:
+        pytest.fail(f"save_metrics() raised exception: {e}")
+
+
+def test_export_metrics(mock_df, tmp_path):
+    metrics = app.create_metrics(mock_df)
+    path = tmp_path / "metrics"
+    n_rows = metrics.shape[0]
+
+    assert export.export_metrics(metrics.iloc[:-10], path) == n_rows - 10
+    assert export.export_metrics(metrics, path) == 10
+    assert export.export_metrics(metrics, path) == 0
+
+    result = export.read_metrics(path)
+    assert list(result)[:2] == ["date", "close"]
+    assert "risk_logpoly" in result
+    assert (path / "close.bin").stat().st_size == n_rows * 8
+    assert np.array_equal(
+        result["date"], pd.to_datetime(metrics["date"]).to_numpy("datetime64[ns]")
+    )
+    assert np.array_equal(result["close"], metrics["close"].to_numpy())
+    assert np.isnan(result["sma_50w"][0])
+    assert np.array_equal(
+        result["sma_50w"], metrics["sma_50w"].to_numpy(), equal_nan=True
+    )
+    assert all(not column.flags.writeable for column in result.values())
+
+
+def test_export_metrics_ignores_partial_append(mock_df, tmp_path):
+    metrics = app.create_metrics(mock_df)
+    path = tmp_path / "metrics"
+    export.export_metrics(metrics.iloc[:-1], path)
+    with (path / "close.bin").open("ab") as f:
+        f.write(b"\0" * 3)
+    assert export.export_metrics(metrics, path) == 1
+    result = export.read_metrics(path)
+    assert np.array_equal(result["close"], metrics["close"].to_numpy())
+
+
+def test_read_metrics_empty(mock_df, tmp_path):
+    metrics = app.create_metrics(mock_df)
+    path = tmp_path / "metrics"
+    export.export_metrics(metrics.iloc[:0], path)
+    result = export.read_metrics(path)
+    assert result["close"].shape == (0,)
+    assert not result["close"].flags.writeable
+
+
+def test_export_metrics_invalid(mock_df, tmp_path):
+    metrics = app.create_metrics(mock_df)
+    path = tmp_path / "metrics"
+    export.export_metrics(metrics, path)
+    with pytest.raises(ValueError, match="do not match"):
+        export.export_metrics(metrics.drop(columns=["risk_diff"]), path)
+
+
+def test_export_metrics_rewrites_refit_columns(mock_df, tmp_path):
+    path = tmp_path / "metrics"
+    prefix = app.create_metrics(mock_df.iloc[:-400].copy())
+    metrics = app.create_metrics(mock_df.copy())
+    export.export_metrics(prefix, path)
+    assert export.export_metrics(metrics, path) == 400
+
+    result = export.read_metrics(path)
+    for c in ["poly", "poly_2021", "risk_diff", "risk_cryptoverse", "risk_logpoly"]:
+        assert np.array_equal(result[c], metrics[c].to_numpy(), equal_nan=True)
+    assert np.allclose(result["sma_50w"], metrics["sma_50w"].to_numpy(), equal_nan=True)
+
+
+def test_export_metrics_invalid_history(mock_df, tmp_path):
+    metrics = app.create_metrics(mock_df)
+    path = tmp_path / "metrics"
+    export.export_metrics(metrics, path)
+    with pytest.raises(ValueError, match="do not cover"):
+        export.export_metrics(metrics.iloc[1:], path)
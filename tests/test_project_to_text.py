@@ -0,0 +1,137 @@
+"""Unit tests for the project snapshot utility."""
+
+import os
+
+import pytest
+
+from utils import project_to_text
+
+MAX_SIZE = 1024
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = tmp_path / "project"
+    (root / "src").mkdir(parents=True)
+    (root / "venv" / "lib").mkdir(parents=True)
+    (root / ".gitignore").write_text("venv/\n")
+    (root / "README.md").write_text("# project\n")
+    (root / "src" / "a.py").write_text("a = 1\n")
+    (root / "src" / "b.py").write_text("b = 2\n")
+    (root / "venv" / "lib" / "c.py").write_text("c = 3\n")
+    return root
+
+
+def snapshot(root, incremental, max_size=MAX_SIZE):
+    n_written = project_to_text.main(
+        root=root, incremental=incremental, max_size=max_size, workers=2
+    )
+    return n_written, (root / "tmp" / "project.txt").read_bytes()
+
+
+def test_main(root):
+    n_written, output = snapshot(root, incremental=False)
+    assert n_written == 4
+    assert b"src/a.py:\na = 1\n" in output
+    assert b"c = 3" not in output
+
+
+def test_main_prunes_ignored_directories(root, monkeypatch):
+    snapshot(root, incremental=False)
+    visited = []
+    walk = os.walk
+
+    def spy_walk(*args, **kwargs):
+        for dirpath, dirnames, filenames in walk(*args, **kwargs):
+            visited.append(os.path.relpath(dirpath, root))
+            yield dirpath, dirnames, filenames
+
+    monkeypatch.setattr(project_to_text.os, "walk", spy_walk)
+    snapshot(root, incremental=True)
+    assert visited == [".", "src"]
+
+
+def test_main_excludes_own_output(root):
+    snapshot(root, incremental=False)
+    (root / "tmp" / "project.txt.partial").write_text("partial")
+    _, output = snapshot(root, incremental=False)
+    assert b"tmp/" not in output
+    assert b"partial" not in output
+
+
+def test_main_incremental(root):
+    snapshot(root, incremental=False)
+    (root / "src" / "a.py").write_text("a = 10\n")
+    n_written, output = snapshot(root, incremental=True)
+    assert n_written == 1
+    assert b"a = 10" in output
+    assert snapshot(root, incremental=False)[1] == output
+
+
+def test_main_incremental_unchanged_hash(root):
+    snapshot(root, incremental=False)
+    path = root / "src" / "b.py"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    n_written, output = snapshot(root, incremental=True)
+    assert n_written == 0
+    assert snapshot(root, incremental=False)[1] == output
+
+
+def test_main_skips_binary(root):
+    (root / "image.png").write_bytes(b"\x89PNG\r\n\x1a\n\0\0")
+    n_written, output = snapshot(root, incremental=False)
+    assert n_written == 4
+    assert b"image.png:" not in output
+
+
+def test_main_skips_oversized(root):
+    (root / "large.txt").write_text("x" * (MAX_SIZE + 1))
+    n_written, output = snapshot(root, incremental=False)
+    assert n_written == 4
+    assert b"large.txt:" not in output
+
+
+def test_main_incremental_max_size(root):
+    (root / "large.txt").write_text("x" * (MAX_SIZE + 1))
+    snapshot(root, incremental=False)
+    n_written, output = snapshot(root, incremental=True, max_size=2 * MAX_SIZE)
+    assert n_written == 1
+    assert b"large.txt:" in output
+
+
+def test_main_skips_missing(root):
+    (root / "link.py").symlink_to(root / "missing.py")
+    n_written, output = snapshot(root, incremental=False)
+    assert n_written == 4
+    assert b"link.py:" not in output
+
+
+def test_main_incremental_stale_index(root):
+    snapshot(root, incremental=False)
+    stale_index = (root / "tmp" / "project.json").read_bytes()
+    (root / "src" / "0.py").write_text('x = "a long line of text"\n')
+    snapshot(root, incremental=False)
+    (root / "tmp" / "project.json").write_bytes(stale_index)
+    n_written, output = snapshot(root, incremental=True)
+    assert n_written == 5
+    assert snapshot(root, incremental=False)[1] == output
+
+
+def test_main_incremental_invalid_index(root):
+    snapshot(root, incremental=False)
+    (root / "tmp" / "project.json").write_text("{")
+    n_written, output = snapshot(root, incremental=True)
+    assert n_written == 4
+    assert snapshot(root, incremental=False)[1] == output
+
+
+def test_main_removes_partial_on_failure(root, monkeypatch):
+    def read_entry(*args):
+        raise RuntimeError("Mock exception")
+
+    monkeypatch.setattr(project_to_text, "read_entry", read_entry)
+    with pytest.raises(RuntimeError):
+        snapshot(root, incremental=False)
+    assert not (root / "tmp" / "project.txt.partial").exists()
+    assert not (root / "tmp" / "project.json.partial").exists()
@@ -1,27 +1,155 @@
-"""Write a text file summary of the project to project tmp directory."""
+"""Write a text file summary of the project to project tmp directory.
+
+Files are read on a thread pool and streamed to the output in a deterministic order.
+Run with `--incremental` to reuse entries from the previous snapshot whose mtime or
+content hash are unchanged.
+"""
+import argparse
+import hashlib
+import json
+import os
 import re
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from itertools import batched
 from pathlib import Path
+from typing import BinaryIO, Generator
 
 import pathspec
 
-root = Path(__file__).parent.parent.resolve()
-tmp = root / "tmp"
-tmp.mkdir(exist_ok=True)
-paths = [p for p in root.rglob("*") if p.is_file()]
-with (root / ".gitignore").open() as f:
-    patterns = [
-        s for s in f.read().splitlines() if (s != "") and (not s.startswith("#"))
-    ]
-spec = pathspec.PathSpec.from_lines("gitwildmatch", patterns)
-relative_paths = [p.relative_to(root).as_posix() for p in paths]
-to_ignore = set(spec.match_files(relative_paths))
-result = [
-    p
-    for p in relative_paths
-    if (p not in to_ignore) and not re.search(r"^(\.git/|data|poetry.lock)", p)
-]
-project_structure = "\n".join(result)
-output = f"""Project name
+re_exclude = re.compile(r"^(\.git/|tmp/|data|poetry.lock)")
+sniff_size = 8192
+
+
+def load_spec(root: Path) -> pathspec.PathSpec:
+    with (root / ".gitignore").open() as f:
+        patterns = [
+            s for s in f.read().splitlines() if (s != "") and (not s.startswith("#"))
+        ]
+    return pathspec.PathSpec.from_lines("gitwildmatch", patterns)
+
+
+def is_ignored(spec: pathspec.PathSpec, relative_path: str) -> bool:
+    return spec.match_file(relative_path) or bool(re_exclude.search(relative_path))
+
+
+def walk(root: Path, spec: pathspec.PathSpec) -> Generator[str, None, None]:
+    """Yield relative file paths in sorted order, pruning ignored directories."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        relative_dir = Path(dirpath).relative_to(root).as_posix()
+        prefix = "" if relative_dir == "." else f"{relative_dir}/"
+        dirnames[:] = sorted(
+            d for d in dirnames if not is_ignored(spec, f"{prefix}{d}/")
+        )
+        for name in sorted(filenames):
+            relative_path = f"{prefix}{name}"
+            if not is_ignored(spec, relative_path):
+                yield relative_path
+
+
+def is_binary(chunk: bytes) -> bool:
+    if b"\0" in chunk:
+        return True
+    try:
+        chunk.decode()
+    except UnicodeDecodeError as e:
+        # a multibyte character may be cut at the end of the sniffed chunk
+        return e.start < len(chunk) - 3
+    return False
+
+
+def read_entry(root: Path, relative_path: str, max_size: int, previous: dict) -> dict:
+    """Return the index record for a file and its entry bytes if it must be written.
+
+    Entries whose mtime and size, or content hash, match the previous snapshot are
+    returned without content so the previous entry is copied instead.
+    """
+    path = root / relative_path
+    try:
+        st = path.stat()
+    except OSError:
+        return {"skipped": "missing"}
+    if not stat.S_ISREG(st.st_mode):
+        return {"skipped": "not a file"}
+    record = {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+    if st.st_size > max_size:
+        return {**record, "skipped": "oversized"}
+    reusable = "sha256" in previous and "skipped" not in previous
+    if reusable and (previous["mtime_ns"], previous["size"]) == (
+        st.st_mtime_ns,
+        st.st_size,
+    ):
+        return {**previous, "content": None}
+    try:
+        with path.open("rb") as f:
+            if is_binary(f.read(sniff_size)):
+                return {**record, "skipped": "binary"}
+            f.seek(0)
+            data = f.read()
+    except OSError:
+        return {"skipped": "missing"}
+    sha256 = hashlib.sha256(data).hexdigest()
+    if reusable and previous["sha256"] == sha256:
+        return {**previous, **record, "content": None}
+    try:
+        content = f"{relative_path}:\n{data.decode()}\n\n".encode()
+    except UnicodeDecodeError:
+        return {**record, "skipped": "binary"}
+    return {**record, "sha256": sha256, "content": content}
+
+
+def read_range(src: BinaryIO, offset: int, length: int) -> Generator[bytes, None, None]:
+    src.seek(offset)
+    while length > 0:
+        chunk = src.read(min(length, 1 << 20))
+        if not chunk:
+            raise ValueError("Previous snapshot is shorter than its index.")
+        yield chunk
+        length -= len(chunk)
+
+
+def file_sha256(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(1 << 20):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def load_index(path_index: Path, path_output: Path) -> dict:
+    """Return the previous file records if the index matches the previous output.
+
+    Any missing, unreadable or mismatched index falls back to a full rewrite.
+    """
+    if not (path_index.exists() and path_output.exists()):
+        return {}
+    try:
+        with path_index.open() as f:
+            index = json.load(f)
+        valid = index["output_size"] == path_output.stat().st_size and (
+            index["output_sha256"] == file_sha256(path_output)
+        )
+        files = index["files"] if valid else {}
+    except (OSError, ValueError, KeyError, TypeError):
+        files = {}
+    if not files:
+        print(f"{path_index} does not match {path_output}, rewriting all entries")
+    return files
+
+
+def main(root: Path, incremental: bool, max_size: int, workers: int) -> int:
+    """Write the snapshot to `root/tmp/project.txt`, returns entries rewritten."""
+    tmp = root / "tmp"
+    path_output = tmp / "project.txt"
+    path_index = tmp / "project.json"
+    path_partial = tmp / "project.txt.partial"
+    path_index_partial = tmp / "project.json.partial"
+    tmp.mkdir(exist_ok=True)
+    index = load_index(path_index, path_output) if incremental else {}
+
+    result = list(walk(root, load_spec(root)))
+    project_structure = "\n".join(result)
+    header = f"""Project name
 ------------
 {root.name}
 
@@ -32,12 +160,86 @@ Project structure
 Files
 -----
 """
+    new_index, n_written = {}, 0
+    sha256 = hashlib.sha256()
+    previous_output = path_output.open("rb") if index else None
+    try:
+        with (
+            path_partial.open("wb") as out,
+            ThreadPoolExecutor(max_workers=workers) as executor,
+        ):
+
+            def write(data: bytes) -> None:
+                out.write(data)
+                sha256.update(data)
+
+            write(header.encode())
+            # bounded batches keep at most a few files in memory at once
+            for batch in batched(result, workers * 4):
+                records = executor.map(
+                    lambda p: read_entry(root, p, max_size, index.get(p, {})), batch
+                )
+                for path, record in zip(batch, records, strict=True):
+                    content = record.pop("content", None)
+                    if "skipped" not in record:
+                        offset = out.tell()
+                        if content is None:
+                            assert previous_output is not None
+                            for chunk in read_range(
+                                previous_output, record["offset"], record["length"]
+                            ):
+                                write(chunk)
+                        else:
+                            write(content)
+                            n_written += 1
+                        record["offset"] = offset
+                        record["length"] = out.tell() - offset
+                    new_index[path] = record
+            output_size = out.tell()
+        with path_index_partial.open("w") as f:
+            json.dump(
+                {
+                    "output_size": output_size,
+                    "output_sha256": sha256.hexdigest(),
+                    "files": new_index,
+                },
+                f,
+                indent=2,
+            )
+    except BaseException:
+        path_partial.unlink(missing_ok=True)
+        path_index_partial.unlink(missing_ok=True)
+        raise
+    finally:
+        if previous_output is not None:
+            previous_output.close()
+
+    # a stop between the two replaces leaves an index whose output hash mismatches
+    path_partial.replace(path_output)
+    path_index_partial.replace(path_index)
+    n_skipped = sum("skipped" in r for r in new_index.values())
+    print(
+        f"Wrote {path_output}: {len(result)} files, {n_written} entries rewritten, "
+        f"{n_skipped} skipped"
+    )
+    return n_written
 
-for path in result:
-    with Path(root / path).open() as f:
-        content = f.read()
-    output += f"{path}:\n"
-    output += f"{content}\n\n"
 
-with (tmp / "project.txt").open("w") as f:
-    f.write(output)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only rewrite entries whose mtime and content hash changed",
+    )
+    parser.add_argument(
+        "--max-size", type=int, default=1 << 20, help="skip files larger than bytes"
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    main(
+        root=Path(__file__).parent.parent.resolve(),
+        incremental=args.incremental,
+        max_size=args.max_size,
+        workers=args.workers,
+    )